@@ -1,60 +1,337 @@
 import random
-from collections import defaultdict
+import csv
 import math
+import os
+import shutil
+import tempfile
 import statistics as st
 
+import numpy as np
+
 K = 2.3
 THRESHOLD = 0.1
+DEBUG = False # enables consistency checks in the per-tick updates, read when they are compiled, and
+              # the recalculation of the incrementally maintained grids after setup and every tick
+
+# The per-tick turtle updates are compiled with numba when it is available, otherwise they run as
+# plain python which is far slower but handy for debugging.
+#
+# The kernels work on flattened coordinates, row * num_cols + col, and share the manager state as
+# the tuples
+#   cops : (cop_row, cop_col)
+#   agents : (agent_row, agent_col, agent_hardship, agent_risk, agent_active, agent_jail)
+#   grids : (cop_count, free_count, active_count, movable, cops_in_vision, active_in_vision, 
+#            agent_count, hardship_sum, agents_in_vision, hardship_in_vision)
+#   neighbours : (num_rows, num_cols, offset_rows, offset_cols)
+# where the grids are flattened views of the manager's grids so updates are written straight back.
+try:
+    from numba import njit
+    NUMBA = True
+except ImportError:
+    NUMBA = False
+    def njit(*args, **kwargs):
+        """
+        Stands in for numba.njit when numba is not installed by returning the function unchanged
+        """
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
 
-class Agent:
+@njit(cache=True)
+def _neighbour(row, col, k, neighbours):
     """
-    A class to replicate Agents within our population
+    Gets the flattened coordinate of the kth neighbour of a coordinate
     """
+    num_rows, num_cols, offset_rows, offset_cols = neighbours
 
-    num_agents = 0 # a counter to generate agent ids
+    # the offsets are between 0 and the size of the grid so wrapping needs at most one subtraction
+    neighbour_row = row + offset_rows[k]
+    if neighbour_row >= num_rows:
+        neighbour_row -= num_rows
+    neighbour_col = col + offset_cols[k]
+    if neighbour_col >= num_cols:
+        neighbour_col -= num_cols
 
-    def __init__(self):
+    return neighbour_row * num_cols + neighbour_col
+
+if NUMBA:
+    @njit(cache=True)
+    def _add_in_vision(in_vision, cell, change, neighbours):
         """
-        Generates a new Agent with randomised hardship and risk aversion
+        Adds a change to an in vision grid at every coordinate within vision of a cell
         """
-        self.agent_id = Agent.num_agents # the unique identifier of the agent
-        Agent.num_agents += 1
+        num_cols, offset_rows = neighbours[1], neighbours[2]
+        row, col = cell // num_cols, cell % num_cols
+        for k in range(len(offset_rows)):
+            in_vision[_neighbour(row, col, k, neighbours)] += change
 
-        self.perceived_hardship = random.random() # the perceived hardship
-        self.risk_aversion = random.random() # the risk aversion of the agent
-        self.active = False # whether the agent is active
-        self.jail_term = 0 # how many ticks left before leaving jail
+    @njit(cache=True)
+    def _choose_target(cell, movable, neighbours, rng):
+        """
+        Chooses a random movable patch within vision of a cell, or -1 when there are none
+        """
+        num_cols, offset_rows = neighbours[1], neighbours[2]
+        row, col = cell // num_cols, cell % num_cols
+
+        num_targets = 0
+        for k in range(len(offset_rows)):
+            if movable[_neighbour(row, col, k, neighbours)]:
+                num_targets += 1
+
+        # nothing to do when every patch in vision is occupied, which is common on crowded grids
+        if num_targets == 0:
+            return -1
+
+        target = rng.integers(0, num_targets)
+        for k in range(len(offset_rows)):
+            neighbour = _neighbour(row, col, k, neighbours)
+            if movable[neighbour]:
+                if target == 0:
+                    return neighbour
+                target -= 1
+        return -1
+else:
+    # as plain python the loops over the neighbour offsets dominate, so the helpers that visit a
+    # whole neighbourhood are vectorised over the offsets instead. The offsets come
+    # from a wrapped mask so the cells in vision are distinct and give the same results as the loops
+    def _vision_cells(cell, neighbours):
+        """
+        Gets the flattened coordinates of every cell within vision of a cell
+        """
+        num_rows, num_cols, offset_rows, offset_cols = neighbours
+        rows = (cell // num_cols + offset_rows) % num_rows
+        cols = (cell % num_cols + offset_cols) % num_cols
+        return rows * num_cols + cols
 
-    def __str__(self):
-        return "Agent " + str(self.agent_id) + ": (a:" + str(self.active) + ", j:" + str(self.jail_term) + ")"
-    
-    def __eq__(self, other):
-        return isinstance(other, Agent) and self.agent_id == other.agent_id
-    
-    def __hash__(self):
-        return hash("A:" + str(self.agent_id))
-    
-class Cop:
-    """
-    A class to replicate Cops within our population
-    """
-    numCops = 0 # a counter to generate cop ids
+    def _add_in_vision(in_vision, cell, change, neighbours):
+        """
+        Adds a change to an in vision grid at every coordinate within vision of a cell
+        """
+        in_vision[_vision_cells(cell, neighbours)] += change
 
-    def __init__(self):
+    def _choose_target(cell, movable, neighbours, rng):
         """
-        Generates a new cop
+        Chooses a random movable patch within vision of a cell, or -1 when there are none
         """
-        self.cop_id = Cop.numCops # the unique identifier for the cop
-        Cop.numCops += 1
+        cells = _vision_cells(cell, neighbours)
+        targets = cells[movable[cells]]
+        if len(targets) == 0:
+            return -1
+        return targets[rng.integers(0, len(targets))]
+
+@njit(cache=True)
+def _move_turtle(turtle, is_cop, source, destination, num_cols, cops, agents, grids, neighbours, 
+                 aggregate_greivance):
+    """
+    Moves a turtle from one cell to another, agents being moved must be unjailed. The agents and 
+    hardship within vision are only kept up to date while aggregate greivance is enabled
+    """
+    cop_row, cop_col = cops
+    agent_row, agent_col, agent_hardship, _, agent_active, _ = agents
+    cop_count, free_count, active_count, movable, cops_in_vision, active_in_vision = grids[:6]
+    agent_count, hardship_sum, agents_in_vision, hardship_in_vision = grids[6:]
+
+    if is_cop:
+        cop_count[source] -= 1
+        cop_count[destination] += 1
+        _add_in_vision(cops_in_vision, source, -1, neighbours)
+        _add_in_vision(cops_in_vision, destination, 1, neighbours)
+        cop_row[turtle] = destination // num_cols
+        cop_col[turtle] = destination % num_cols
+    else:
+        free_count[source] -= 1
+        free_count[destination] += 1
+        if agent_active[turtle]:
+            active_count[source] -= 1
+            active_count[destination] += 1
+            _add_in_vision(active_in_vision, source, -1, neighbours)
+            _add_in_vision(active_in_vision, destination, 1, neighbours)
+
+        # the agent's hardship moves with it for the aggregate grievance
+        hardship = np.float64(agent_hardship[turtle])
+        agent_count[source] -= 1
+        agent_count[destination] += 1
+        hardship_sum[source] -= hardship
+        hardship_sum[destination] += hardship
+        if aggregate_greivance:
+            _add_in_vision(agents_in_vision, source, -1, neighbours)
+            _add_in_vision(agents_in_vision, destination, 1, neighbours)
+            _add_in_vision(hardship_in_vision, source, -hardship, neighbours)
+            _add_in_vision(hardship_in_vision, destination, hardship, neighbours)
+        agent_row[turtle] = destination // num_cols
+        agent_col[turtle] = destination % num_cols
+
+    movable[source] = cop_count[source] == 0 and free_count[source] == 0
+    movable[destination] = False
+
+@njit(cache=True)
+def _move(turtle, is_cop, cell, num_cols, cops, agents, grids, neighbours, aggregate_greivance, 
+          rng):
+    """
+    Rule M: moves a turtle to a random patch in vision which is empty or contains only jailed agents
+    """
+    # select a target location for our turtle to move to
+    target = _choose_target(cell, grids[3], neighbours, rng)
+    if target != -1:
+        _move_turtle(turtle, is_cop, cell, target, num_cols, cops, agents, grids, neighbours, 
+                     aggregate_greivance)
+
+@njit(cache=True)
+def _set_active(agent, active, num_cols, agents, grids, neighbours):
+    """
+    Updates whether an agent is active
+    """
+    agent_row, agent_col, _, _, agent_active, _ = agents
+    active_count, active_in_vision = grids[2], grids[5]
 
-    def __str__(self):
-        return "Cop " + str(self.cop_id)
-    
-    def __eq__(self, other):
-        return isinstance(other, Cop) and self.cop_id == other.cop_id
-    
-    def __hash__(self):
-        return hash("C:" + str(self.cop_id))
+    if agent_active[agent] != active:
+        cell = agent_row[agent] * num_cols + agent_col[agent]
+        change = 1 if active else -1
+
+        active_count[cell] += change
+        _add_in_vision(active_in_vision, cell, change, neighbours)
+        agent_active[agent] = active
+
+@njit(cache=True)
+def _determine_behaviour(agent, num_cols, agents, grids, neighbours, one_minus_legitimacy, 
+                         arrest_probability, shift_perceived_hardship, aggregate_greivance):
+    """
+    Rule A: determines whether an agent should become active
+    """
+    agent_row, agent_col, agent_hardship, agent_risk, _, _ = agents
+    cops_in_vision, active_in_vision = grids[4], grids[5]
+    hardship_sum, agents_in_vision, hardship_in_vision = grids[7], grids[8], grids[9]
+
+    cell = agent_row[agent] * num_cols + agent_col[agent]
+
+    # the float32 state is widened so the arithmetic is done in double precision both when
+    # compiled and as plain python, where numpy would otherwise keep it in float32
+
+    # shift perceived hardship over time to either 0 or 1
+    if shift_perceived_hardship:
+        previous_hardship = np.float64(agent_hardship[agent])
+        perceived_hardship = previous_hardship + 0.1 * (previous_hardship - 0.5)
+
+        # ensure we dont go out of bounds, rounding to the stored precision first so the hardship
+        # sums change by exactly what is stored
+        hardship = np.float32(min(max(perceived_hardship, 0.0), 1.0))
+        agent_hardship[agent] = hardship
+
+        # keep the hardship sums up to date with the stored hardship
+        change = np.float64(hardship) - previous_hardship
+        hardship_sum[cell] += change
+        if aggregate_greivance:
+            _add_in_vision(hardship_in_vision, cell, change, neighbours)
+
+    # get greivance of all neighbour agents, including jailed agents and the agent itself
+    if aggregate_greivance:
+        # the legitimacy is shared so it can be applied once to the total hardship
+        grievance = hardship_in_vision[cell] * one_minus_legitimacy / agents_in_vision[cell]
+    else:
+        # calculate grievance using standard formula
+        grievance = np.float64(agent_hardship[agent]) * one_minus_legitimacy
+
+    # estimate arrest probability
+    c = cops_in_vision[cell]
+    a = 1 + active_in_vision[cell]
+
+    estimated_arrest_probability = arrest_probability[c // a]
+
+    return (grievance - np.float64(agent_risk[agent]) * estimated_arrest_probability) > THRESHOLD
+
+@njit(cache=True)
+def _enforce(cop, cell, num_cols, max_jail_term, cops, agents, grids, neighbours, rng):
+    """
+    Rule C: the cop arrests a random active agent within its vision
+    """
+    cop_row, cop_col = cops
+    agent_row, agent_col, _, _, agent_active, agent_jail = agents
+    free_count, active_count, active_in_vision = grids[1], grids[2], grids[5]
+    offset_rows = neighbours[2]
+
+    # the suspects are the active agents near the cop
+    num_suspects = active_in_vision[cell]
+    if num_suspects == 0:
+        return
+
+    # choose suspect, first find the patch they are on and then which of its active agents they are
+    suspect_index = rng.integers(0, num_suspects)
+    suspect_cell = -1
+    row, col = cell // num_cols, cell % num_cols
+    for k in range(len(offset_rows)):
+        neighbour = _neighbour(row, col, k, neighbours)
+        if suspect_index < active_count[neighbour]:
+            suspect_cell = neighbour
+            break
+        suspect_index -= active_count[neighbour]
+
+    suspect = -1
+    for agent in range(len(agent_row)):
+        if agent_active[agent] and agent_row[agent] * num_cols + agent_col[agent] == suspect_cell:
+            if suspect_index == 0:
+                suspect = agent
+                break
+            suspect_index -= 1
+
+    # move cop to suspect
+    if DEBUG:
+        cop_cell = cop_row[cop] * num_cols + cop_col[cop]
+        if cell != cop_cell:
+            print("Failed")
+            print(cell)
+            print(cop_cell)
+    _move_turtle(cop, True, cell, suspect_cell, num_cols, cops, agents, grids, neighbours, False)
+
+    # arrest suspect
+    _set_active(suspect, False, num_cols, agents, grids, neighbours)
+    # a max jail term of 0 gives an empty range which numba's generator doesn't reject, so it is
+    # handled here as a jail term of 0 like Netlogo's random 0
+    if max_jail_term > 0:
+        agent_jail[suspect] = rng.integers(0, max_jail_term)
+    else:
+        agent_jail[suspect] = 0
+    if agent_jail[suspect] != 0:
+        free_count[suspect_cell] -= 1
+
+@njit(cache=True)
+def _tick(schedule, num_cols, cops, agents, grids, neighbours, one_minus_legitimacy, 
+          arrest_probability, max_jail_term, movement_enabled, shift_perceived_hardship, 
+          aggregate_greivance, rng):
+    """
+    Applies the rules to each turtle in the order of the schedule, where turtles below the number of
+    cops are cops and the rest are agents offset by the number of cops
+    """
+    cop_row, cop_col = cops
+    agent_row, agent_col, _, _, _, agent_jail = agents
+    num_cops = len(cop_row)
+
+    # the cops and agents are interleaved in the schedule, they can't be updated in separate
+    # passes as each turtle's update depends on the turtles updated before it
+    for turtle in schedule:
+        if turtle < num_cops:
+            cop = turtle
+
+            # Rule M: Move to a random site within your vision
+            _move(cop, True, cop_row[cop] * num_cols + cop_col[cop], num_cols, cops, agents, grids, 
+                  neighbours, False, rng)
+
+            # Rule C: Cops arrest a random active agent within their radius
+            _enforce(cop, cop_row[cop] * num_cols + cop_col[cop], num_cols, max_jail_term, cops, 
+                     agents, grids, neighbours, rng)
+        else:
+            agent = turtle - num_cops
+
+            if agent_jail[agent] == 0:
+                # Rule M: Move to a random site within your vision
+                if movement_enabled:
+                    _move(agent, False, agent_row[agent] * num_cols + agent_col[agent], num_cols, 
+                          cops, agents, grids, neighbours, aggregate_greivance, rng)
+
+                # Rule A: Determine if each agent should be active or quiet
+                active = _determine_behaviour(agent, num_cols, agents, grids, neighbours, 
+                                              one_minus_legitimacy, arrest_probability, 
+                                              shift_perceived_hardship, aggregate_greivance)
+                _set_active(agent, active, num_cols, agents, grids, neighbours)
 
 class RebellionManager:
     """
@@ -133,7 +410,7 @@ class RebellionManager:
             raise ValueError("The sum of initial_cop_density and " + 
                                 "initial_agent_density should not be greater than 100.")
     
-    def __init__(self, max_pxcor=39, max_pycor=39):
+    def __init__(self, max_pxcor=39, max_pycor=39, seed=None):
         """
         The constructor for our rebellion manager
 
@@ -143,23 +420,42 @@ class RebellionManager:
             the max x coordinate of the grid, by default 39
         max_pycor : int, optional
             the max y coordinate of the grid, by default 39
+        seed : int, optional
+            the seed for the random number generators, by default None which seeds them from the
+            operating system
         """
+        # the state of the system at each tick, the rows are streamed to a temporary csv as the
+        # simulation runs and only the counts are kept for the statistics. They are set first so
+        # the temporary csv can always be cleaned up
+        self._report_path = None # the temporary csv, copied to test.csv by generate_report
+        self._report_file = None # the open temporary csv, None while the stream is closed
+        self._report_writer = None
+        self._history = np.zeros((0, 3), dtype=np.int32) # the quiet, jailed and active counts
+        self._history_length = 0 # the number of ticks recorded in the history
+
+        # initialise the random number generators, the python generator places the turtles and the 
+        # numpy generator is used for everything else
+        self._rng = random.Random(seed)
+        self._nprng = np.random.default_rng(seed)
+
         # initialise world
         self._tick = 0 # counter
         self._num_rows = max_pycor + 1 # x coordinate range
         self._num_cols = max_pxcor +  1 # y coordinate range
-        # a mapping between a coordinate and the turtles that exist at the coordinate
-        self._coord_turtles = defaultdict(list)
-        # a mapping between a turtle and its coordinate on the grid
-        self._turtle_coords = dict()
-        
-        # stores the state of the system at each tick
-        self._report = []
+        self._num_cops = 0
+        self._num_agents = 0
+        self.__init_turtle_state()
+
+    def __del__(self):
+        """
+        Removes the temporary report csv when the manager is discarded
+        """
+        self.__discard_report()
 
     def setup(self, initial_cop_density, initial_agent_density, vision, government_legitimacy=0.82, 
-                max_jail_term=25, movement_enabled=False, aggregate_greivance=False):
+                max_jail_term=25, movement_enabled=False, aggregate_greivance=False, verbose=False):
         """
-        Setups the turtles on the grid and resets all necessary counters
+        Setups the turtles on the grid, resets all necessary counters and optionally prints the grid
 
         Parameters
         ----------
@@ -177,111 +473,294 @@ class RebellionManager:
             whether movement is enabled, by default False
         aggregate_greivance : bool, optional
             whether aggregate greivance is enabled, by default False
+        verbose : bool, optional
+            whether to print the board, by default False
         """
         # perform validation
         self.__validate_parameters(initial_cop_density, initial_agent_density, vision, 
                         government_legitimacy, max_jail_term, movement_enabled)
         
-        # reset world
-        self._tick = 0
-        self._coord_turtles = defaultdict(list)
-        self._turtle_coords = dict()
-        
         # initialise other parameters
         self._num_cops = round(initial_cop_density * 0.01 * self._num_rows * self._num_cols)
         self._num_agents = round(initial_agent_density * 0.01 * self._num_rows * self._num_cols)
         self._vision = vision
         self._government_legitimacy = government_legitimacy
+        self._one_minus_legitimacy = 1 - government_legitimacy # used by every agent's grievance
         self._max_jail_term = max_jail_term
         self._movement_enabled = movement_enabled
 
-        # define our neighbours dictionary which maps a coordinate to its set of neighbours
+        # the estimated arrest probability for each ratio of cops to active agents in vision, the
+        # ratio can't exceed the number of cops
+        self._arrest_probability = np.array([1 - math.exp(-K * ratio) 
+                                             for ratio in range(self._num_cops + 1)])
+
+        # reset world
+        self._tick = 0
+        self.__init_turtle_state()
+
+        # define our neighbour offsets which map a coordinate to its set of neighbours
         self.__init_coord_neighbours()
         
-        # initialise empty grid spots
-        available_patches = []
-        for i in range(self._num_rows):
-            for j in range(self._num_cols):
-                available_patches.append((i, j))
+        # choose a distinct random patch for every turtle, as flattened coordinates
+        patches = self._rng.sample(range(self._num_rows * self._num_cols), 
+                                self._num_cops + self._num_agents)
 
-        for _ in range(self._num_cops):
-            # get random empty spot
-            index = random.randrange(len(available_patches))
-            (row, col) = available_patches.pop(index)
+        # generate the agents' randomised hardship and risk aversion
+        self._agent_hardship[:] = self._nprng.random(self._num_agents, dtype=np.float32)
+        self._agent_risk[:] = self._nprng.random(self._num_agents, dtype=np.float32)
 
-            # generate a new cop
-            cop = Cop()
+        # the agent placed at each coordinate, only used during placement
+        agent_at = np.full((self._num_rows, self._num_cols), -1, dtype=np.int32)
 
-            self._coord_turtles[(row, col)] = [cop]
-            self._turtle_coords[cop] = (row, col)
+        for cop, patch in enumerate(patches[:self._num_cops]):
+            (row, col) = divmod(patch, self._num_cols)
 
-        for _ in range(self._num_agents):
-            # get random empty spot
-            index = random.randrange(len(available_patches))
-            (row, col) = available_patches.pop(index)
+            # place a new cop
+            self._cop_row[cop] = row
+            self._cop_col[cop] = col
+            self._cop_count[row, col] += 1
 
-            # generate a new agent
-            agent = Agent()
+        for agent, patch in enumerate(patches[self._num_cops:]):
+            (row, col) = divmod(patch, self._num_cols)
 
             # shift perceived hardships according to neighbours by a scale
             # this will exacerbate the aggregate greivances calculations during the agent behaviour 
             # update step
             if aggregate_greivance:
-                neighbour_hardships = []
-                
-                for neighbour_coord in self._coord_neighbours[(row, col)]:
-                    for neighbour in self._coord_turtles[neighbour_coord]:
-                        if isinstance(neighbour, Agent):
-                            neighbour_hardships.append(neighbour.perceived_hardship)
-
-                agent.perceived_hardship += (0.1 * 
-                                             ((sum(neighbour_hardships) 
-                                               / max(len(neighbour_hardships), 0.0001)) 
-                                               - agent.perceived_hardship))
-
-            self._coord_turtles[(row, col)] = [agent]
-            self._turtle_coords[agent] = (row, col)
+                perceived_hardship = self._agent_hardship[agent]
+                neighbour_agents = agent_at.ravel()[self.__neighbours((row, col))]
+                neighbour_hardships = self._agent_hardship[neighbour_agents[neighbour_agents != -1]]
+
+                perceived_hardship += (0.1 * 
+                                       ((sum(neighbour_hardships) 
+                                         / max(len(neighbour_hardships), 0.0001)) 
+                                         - perceived_hardship))
+                self._agent_hardship[agent] = perceived_hardship
+
+            # place the agent
+            self._agent_row[agent] = row
+            self._agent_col[agent] = col
+            self._free_count[row, col] += 1
+            self._agent_count[row, col] += 1
+            self._hardship_sum[row, col] += float(self._agent_hardship[agent])
+            agent_at[row, col] = agent
+
+        # count the turtles within vision of each coordinate, these are kept up to date as the
+        # turtles move and change state
+        self._movable = (self._cop_count == 0) & (self._free_count == 0)
+        self._cops_in_vision = self.__sum_in_vision(self._cop_count)
+        self._active_in_vision = self.__sum_in_vision(self._active_count)
+
+        if DEBUG:
+            self.__check_state()
 
         # start new report
-        self._report = [{"tick": 0, "quiet": self._num_agents, "jailed": 0, "active": 0}]
+        self.__start_report()
 
-        self.__print_patches()
+        # print initial state
+        if verbose:
+            self.__print_patches()
+
+    def __init_turtle_state(self):
+        """
+        Allocates the arrays which store the state of every turtle, turtles are referred to by their 
+        index into these arrays
+        """
+        # agent state, the hardship and risk aversion lie in [0, 1] and the jail terms are at most
+        # 50 so narrow types are used to keep the arrays small
+        self._agent_row = np.zeros(self._num_agents, dtype=np.int32) # the row of each agent
+        self._agent_col = np.zeros(self._num_agents, dtype=np.int32) # the col of each agent
+        self._agent_hardship = np.zeros(self._num_agents, dtype=np.float32) # the perceived hardship
+        self._agent_risk = np.zeros(self._num_agents, dtype=np.float32) # the risk aversion
+        self._agent_active = np.zeros(self._num_agents, dtype=bool) # whether each agent is active
+        self._agent_jail = np.zeros(self._num_agents, dtype=np.int16) # ticks left before leaving jail
+
+        # cop state
+        self._cop_row = np.zeros(self._num_cops, dtype=np.int32) # the row of each cop
+        self._cop_col = np.zeros(self._num_cops, dtype=np.int32) # the col of each cop
+
+        # the number of cops, unjailed agents and active agents at each coordinate, a coordinate
+        # can hold several turtles as cops and agents may share a patch with jailed agents
+        grid_shape = (self._num_rows, self._num_cols)
+        self._cop_count = np.zeros(grid_shape, dtype=np.int32)
+        self._free_count = np.zeros(grid_shape, dtype=np.int32)
+        self._active_count = np.zeros(grid_shape, dtype=np.int32)
+
+        # whether a turtle can move to each coordinate, which requires it to be empty or only
+        # contain jailed agents
+        self._movable = np.ones(grid_shape, dtype=bool)
+
+        # the number of cops and active agents within vision of each coordinate
+        self._cops_in_vision = np.zeros(grid_shape, dtype=np.int32)
+        self._active_in_vision = np.zeros(grid_shape, dtype=np.int32)
+
+        # the number of agents, jailed or not, and their total hardship at and within vision of
+        # each coordinate, which give the aggregate grievance. Moving them within vision is costly
+        # so those grids are only kept up to date during ticks with aggregate grievance and are
+        # recalculated when they are out of date
+        self._agent_count = np.zeros(grid_shape, dtype=np.int32)
+        self._hardship_sum = np.zeros(grid_shape)
+        self._agents_in_vision = np.zeros(grid_shape, dtype=np.int32)
+        self._hardship_in_vision = np.zeros(grid_shape)
+        self._aggregate_in_vision_valid = False
 
     def __init_coord_neighbours(self):
         """
-        Maps each grid coordinate to its set of neighbour coordinates based on toroidal wrapping
-        and euclidean distance from the centre of each cell 
-        """
-        def distance(source, target):
-            # distance calculation which takes into consideration wrapping
-            dx = abs(source[0] - target[0])
-            dy = abs(source[1] - target[1])
-            
-            # Adjust distances for wrapping
-            if dx > self._num_rows / 2:
-                dx = self._num_rows - dx
-            if dy > self._num_cols / 2:
-                dy = self._num_cols - dy
-            
-            return math.sqrt(dx**2 + dy**2)
-
-        neighbours_dict = defaultdict(list)
-        coord_centres = dict()
+        Finds the offsets from a coordinate to its set of neighbour coordinates based on toroidal 
+        wrapping and euclidean distance from the centre of each cell. Distances on the torus don't 
+        depend on where we measure from, so every coordinate shares the offsets of (0, 0)
+        """
+        rows, cols = np.meshgrid(np.arange(self._num_rows), np.arange(self._num_cols), indexing="ij")
 
-        for i in range(self._num_rows):
-            for j in range(self._num_cols):
-                # Netlogo distance calculates from the centre
-                coord_centres[(i, j)] = [i + 0.5, j + 0.5]
-        
-        for coord, centre in coord_centres.items():
-            # the Netlogo implementation for in-radius doesn't exclude the coord
-            for other_coord, other_centre in coord_centres.items():
+        # Netlogo distance calculates from the centre, the distances to the centre of (0, 0) are
+        # adjusted for wrapping
+        dx = np.minimum(rows, self._num_rows - rows)
+        dy = np.minimum(cols, self._num_cols - cols)
 
-                if distance(centre, other_centre) <= self._vision:
-                    neighbours_dict[coord].append(other_coord)
-        
-        # stores the mapping for later use
-        self._coord_neighbours = neighbours_dict
+        # compare squared distances so we can skip the sqrt
+        # the Netlogo implementation for in-radius doesn't exclude the coord
+        in_radius = dx * dx + dy * dy <= self._vision * self._vision
+
+        # stores the offsets for later use, the neighbours of (row, col) are 
+        # ((row + self._offset_rows) % num_rows, (col + self._offset_cols) % num_cols)
+        self._vision_mask = in_radius
+        offset_rows, offset_cols = np.nonzero(in_radius)
+        self._offset_rows = offset_rows.astype(np.int32)
+        self._offset_cols = offset_cols.astype(np.int32)
+
+    def __neighbours(self, coord):
+        """
+        Gets the neighbours of a coordinate
+
+        Parameters
+        ----------
+        coord : (int, int)
+            the coordinate
+
+        Returns
+        -------
+        np.ndarray
+            the flattened coordinates within vision of the coordinate
+        """
+        rows = (coord[0] + self._offset_rows) % self._num_rows
+        cols = (coord[1] + self._offset_cols) % self._num_cols
+        return rows * self._num_cols + cols
+
+    def __sum_in_vision(self, grid):
+        """
+        Sums a grid over the neighbours of every coordinate
+
+        Parameters
+        ----------
+        grid : np.ndarray
+            the grid of values to sum
+
+        Returns
+        -------
+        np.ndarray
+            a grid holding the sum of the values within vision of each coordinate
+        """
+        # the vision mask is symmetric so the sums are the circular convolution of the grid with 
+        # the mask, which is computed with the fft and rounded back to whole numbers for counts
+        in_vision = np.fft.irfft2(np.fft.rfft2(grid) * np.fft.rfft2(self._vision_mask), s=grid.shape)
+        if np.issubdtype(grid.dtype, np.integer):
+            in_vision = np.rint(in_vision)
+        return in_vision.astype(grid.dtype)
+
+    def __check_state(self):
+        """
+        Recalculates the grids which are kept up to date as the turtles move and change state from 
+        the turtle arrays, making sure they haven't drifted from the turtles
+
+        Raises
+        ------
+        RuntimeError
+            when a grid doesn't match its recalculation
+        """
+        grid_shape = (self._num_rows, self._num_cols)
+        free = self._agent_jail == 0
+        active = self._agent_active
+
+        if (active & ~free).any():
+            raise RuntimeError("jailed agents are active")
+
+        def count(rows, cols, weights=1, dtype=np.int32):
+            """
+            Counts the turtles or sums their weights at each coordinate
+            """
+            grid = np.zeros(grid_shape, dtype=dtype)
+            np.add.at(grid, (rows, cols), weights)
+            return grid
+
+        def in_vision(grid):
+            """
+            Sums a grid within vision of each coordinate by visiting every offset, independently of
+            the fft in __sum_in_vision
+            """
+            total = np.zeros_like(grid)
+            for offset in zip(self._offset_rows, self._offset_cols):
+                total += np.roll(grid, (-offset[0], -offset[1]), axis=(0, 1))
+            return total
+
+        cop_count = count(self._cop_row, self._cop_col)
+        free_count = count(self._agent_row[free], self._agent_col[free])
+        active_count = count(self._agent_row[active], self._agent_col[active])
+        expected = [("cop count", self._cop_count, cop_count), 
+                    ("free count", self._free_count, free_count), 
+                    ("active count", self._active_count, active_count), 
+                    ("movable", self._movable, (cop_count == 0) & (free_count == 0)), 
+                    ("cops in vision", self._cops_in_vision, in_vision(cop_count)), 
+                    ("active in vision", self._active_in_vision, in_vision(active_count)), 
+                    ("agent count", self._agent_count, count(self._agent_row, self._agent_col))]
+        for name, grid, recalculated in expected:
+            if not np.array_equal(grid, recalculated):
+                raise RuntimeError(f"the {name} grid is out of date")
+
+        # the hardship sums are updated by differences so they only match up to rounding
+        hardship_sum = count(self._agent_row, self._agent_col, 
+                             self._agent_hardship.astype(np.float64), np.float64)
+        if not np.allclose(self._hardship_sum, hardship_sum):
+            raise RuntimeError("the hardship sum grid is out of date")
+
+        # the aggregate grids are only kept up to date during ticks with aggregate greivance
+        if self._aggregate_in_vision_valid:
+            if not np.array_equal(self._agents_in_vision, in_vision(self._agent_count)):
+                raise RuntimeError("the agents in vision grid is out of date")
+            if not np.allclose(self._hardship_in_vision, in_vision(hardship_sum)):
+                raise RuntimeError("the hardship in vision grid is out of date")
+
+    def __str_agent(self, agent):
+        """
+        Describes an agent
+
+        Parameters
+        ----------
+        agent : int
+            the index of the agent
+
+        Returns
+        -------
+        string
+            the agent's id, whether it is active and its remaining jail term
+        """
+        return ("Agent " + str(agent) + ": (a:" + str(bool(self._agent_active[agent])) + 
+                ", j:" + str(self._agent_jail[agent]) + ")")
+
+    def __str_cop(self, cop):
+        """
+        Describes a cop
+
+        Parameters
+        ----------
+        cop : int
+            the index of the cop
+
+        Returns
+        -------
+        string
+            the cop's id
+        """
+        return "Cop " + str(cop)
 
     def __print_patches(self):
         """
@@ -290,229 +769,169 @@ class RebellionManager:
         print(f"Tick = {self._tick}\nNum Cops = {self._num_cops}" +
                                             "\nNum Agents = {self._num_agents}\n")
 
+        # gather the turtles that exist at each flattened coordinate
+        cell_turtles = [[] for _ in range(self._num_rows * self._num_cols)]
+        cop_cells = self._cop_row * self._num_cols + self._cop_col
+        for cop, cell in enumerate(cop_cells.tolist()):
+            cell_turtles[cell].append(self.__str_cop(cop))
+        agent_cells = self._agent_row * self._num_cols + self._agent_col
+        for agent, cell in enumerate(agent_cells.tolist()):
+            cell_turtles[cell].append(self.__str_agent(agent))
+
         for i in range(self._num_rows):
-            str_row = ""
+            str_cells = []
             for j in range(self._num_cols):
-                str_cell = ""       
-
-                if self._coord_turtles[(i, j)] != []:
-                    for char in self._coord_turtles[(i, j)]:
-                        str_cell += str(char) + ", "
+                turtles = cell_turtles[i * self._num_cols + j]
+                if turtles:
+                    str_cell = "".join(turtle + ", " for turtle in turtles)
                 else:
-                    str_cell += "Empty"
+                    str_cell = "Empty"
 
-                str_row += "(" + str_cell + ") "
+                str_cells.append("(" + str_cell + ") ")
 
-            print("[" + str_row + "]")
+            print("[" + "".join(str_cells) + "]")
 
         print("")
 
-    def go(self, mute=False, shift_perceived_hardship=False, aggregate_greivance=False):
+    def go(self, verbose=False, shift_perceived_hardship=False, aggregate_greivance=False):
         """
         Simulates one tick in time and optionally prints the new grid configuration
 
         Parameters
         ----------
-        mute : bool, optional
-            whether to mute board printing, by default False
+        verbose : bool, optional
+            whether to print the board, by default False
         shift_perceived_hardship : bool, optional
             whether scale shifting is enabled, by default False
         aggregate_greivance : bool, optional
             whether aggregate grievance is enabled, by default False
         """
-        # create a randomly shuffled set of turtle coords
-        shuffled_turtle_coords = list(self._turtle_coords.items())
-        random.shuffle(shuffled_turtle_coords)
-        
-        for turtle, turtle_coord in shuffled_turtle_coords:
-            # Rule M: Move to a random site within your vision
-            if (isinstance(turtle, Agent) and turtle.jail_term == 0) or isinstance(turtle, Cop):
-                self.__move(turtle, turtle_coord)
-
-            # Rule A: Determine if each agent should be active or quiet
-            if (isinstance(turtle, Agent) and turtle.jail_term == 0):
-                turtle.active = self.__determine_behaviour(turtle, shift_perceived_hardship, aggregate_greivance)
-
-            # Rule C: Cops arrest a random active agent within their radius
-            if isinstance(turtle, Cop):
-                self.__enforce(turtle, self._turtle_coords[turtle])
+        if aggregate_greivance and not self._aggregate_in_vision_valid:
+            self._agents_in_vision = self.__sum_in_vision(self._agent_count)
+            self._hardship_in_vision = self.__sum_in_vision(self._hardship_sum)
+        self._aggregate_in_vision_valid = aggregate_greivance
+
+        # create a randomly shuffled schedule of turtles, the cops come first followed by the agents
+        # agents in jail can't act so only the free agents are scheduled, agents arrested during the
+        # tick are still skipped by the kernel
+        free_agents = np.flatnonzero(self._agent_jail == 0) + self._num_cops
+        schedule = self._nprng.permutation(np.concatenate((np.arange(self._num_cops), free_agents)))
+
+        # apply the rules to every turtle
+        _tick(schedule, self._num_cols, 
+              (self._cop_row, self._cop_col), 
+              (self._agent_row, self._agent_col, self._agent_hardship, self._agent_risk, 
+               self._agent_active, self._agent_jail), 
+              (self._cop_count.ravel(), self._free_count.ravel(), self._active_count.ravel(), 
+               self._movable.ravel(), self._cops_in_vision.ravel(), self._active_in_vision.ravel(), 
+               self._agent_count.ravel(), self._hardship_sum.ravel(), 
+               self._agents_in_vision.ravel(), self._hardship_in_vision.ravel()), 
+              (self._num_rows, self._num_cols, self._offset_rows, self._offset_cols), 
+              self._one_minus_legitimacy, self._arrest_probability, self._max_jail_term, 
+              self._movement_enabled, 
+              shift_perceived_hardship, aggregate_greivance, self._nprng)
 
         # Jailed agents get their term reduced at the end of each clock tick
         # The Netlogo implementation doesn't account for freshly jailed agents
-        for turtle in self._turtle_coords.keys():
-            if isinstance(turtle, Agent):
-                turtle.jail_term = max(0, turtle.jail_term - 1)
+        jailed_agents = np.flatnonzero(self._agent_jail)
+        self._agent_jail[jailed_agents] -= 1
+
+        released = jailed_agents[self._agent_jail[jailed_agents] == 0]
+        released_coords = (self._agent_row[released], self._agent_col[released])
+        np.add.at(self._free_count, released_coords, 1)
+        self._movable[released_coords] = False
 
         # increment our tick
         self._tick += 1
 
         # update report
-        quiet = 0
-        jailed = 0
-        active = 0
-        for turtle in self._turtle_coords.keys():
-            if isinstance(turtle, Agent):
-                if turtle.jail_term != 0:
-                    jailed += 1
-                elif turtle.active:
-                    active += 1
-                else:
-                    quiet += 1
+        jailed = int(np.count_nonzero(self._agent_jail))
+        active = int(np.count_nonzero(self._agent_active))
+        quiet = self._num_agents - jailed - active
+
+        self.__record_report(quiet, jailed, active)
 
-        self._report.append({"tick": self._tick, "quiet": quiet, "jailed": jailed, "active": active})
+        if DEBUG:
+            self.__check_state()
         
         # print new state
-        if not mute:
+        if verbose:
             self.__print_patches()
 
-    def __move_turtle(self, turtle, source, destination):
+    def __start_report(self):
         """
-        Helper function which moves a turtle from one coordinate to another
-
-        Parameters
-        ----------
-        turtle : Agent or Cop
-            the turtle we are moving
-        source : _type_
-            the source coordinate
-        destination : _type_
-            the destination coordinate
-        """
-        # add turtle to destination
-        self._coord_turtles[destination].append(turtle)
-
-        # remove from source
-        self._coord_turtles[source] = [c for c in self._coord_turtles[source] if c != turtle]
-        # change turtle location
-        self._turtle_coords[turtle] = destination
-        
-    def __move(self, turtle, coord):
+        Opens a new temporary report csv and records the initial state of the system
         """
-        Helper function to help simulate a tick in the go function, moves a turtle to a valid space
+        self.__discard_report()
 
-        Parameters
-        ----------
-        turtle : Agent or Cop
-            the turtle being moved
-        coord : (int, int)
-            the current coordinate of the turtle
-        """
-        if self._movement_enabled or isinstance(turtle, Cop):
-            # move to a patch in vision
-            # candidate patches are empty or contain only jailed agents
-            targets = []
-            for neighbour_i, neighbour_j in self._coord_neighbours[coord]:
-                turtles_at_neighbour = self._coord_turtles[(neighbour_i, neighbour_j)]
+        # each manager streams to its own file so managers don't overwrite each other's rows
+        (fd, self._report_path) = tempfile.mkstemp(prefix="rebellion-", suffix=".csv")
+        os.close(fd)
+        self.__open_report("w")
+        self._report_writer.writerow(["tick", "quiet", "jailed", "active"])
 
-                if turtles_at_neighbour == []:
-                    targets.append((neighbour_i, neighbour_j))
-                else:
-                    # check if neighbour cell contains only jailed agents
-                    valid_square = True
-
-                    for other_turtle in turtles_at_neighbour:
-                        if not isinstance(other_turtle, Agent) or other_turtle.jail_term == 0:
-                            valid_square = False
-                            break
-                    
-                    if valid_square:
-                        targets.append((neighbour_i, neighbour_j))
-
-            # select a target location for our turtle to move to
-            if targets:
-                destination = random.choice(targets)
-                self.__move_turtle(turtle, coord, destination)
-       
-    def __determine_behaviour(self, turtle: Agent, shift_perceived_hardship, aggregate_greivance):
-        """
-        Helper function to help simulate a tick in the go function,determines an agents activeness
+        self._history = np.zeros((128, 3), dtype=np.int32)
+        self._history_length = 0
+        self.__record_report(self._num_agents, 0, 0)
+
+    def __open_report(self, mode):
+        """
+        Opens the temporary report csv for writing
 
         Parameters
         ----------
-        turtle : Agent
-            the agent
-        shift_perceived_hardship : bool
-            whether scale shifting is enabled
-        aggregate_greivance : bool
-            whether aggregate greivance is enabled
-
-        Returns
-        -------
-        bool
-            whether the agent should become active
-        """
-        # shift perceived hardship over time to either 0 or 1
-        if shift_perceived_hardship:
-            turtle.perceived_hardship += 0.1 * (turtle.perceived_hardship - 0.5)
-            
-            # ensure we dont go out of bounds
-            if turtle.perceived_hardship < 0:
-                turtle.perceived_hardship = 0
-            if turtle.perceived_hardship > 1:
-                turtle.perceived_hardship = 1
-
-        # get greivance of all neighbour agents
-        if aggregate_greivance:
-            current_turtle_location = self._turtle_coords[turtle]
-            neighbour_grievances = []
-
-            for neighbour_coord in self._coord_neighbours[current_turtle_location]:
-                for neighbour in self._coord_turtles[neighbour_coord]:
-                    if isinstance(neighbour, Agent):
-                        neighbour_grievances.append(neighbour.perceived_hardship * (1 - self._government_legitimacy))
-
-            grievance = sum(neighbour_grievances) / len(neighbour_grievances)
-        else:
-            # calculate grievance using standard formula
-            grievance = turtle.perceived_hardship * (1 - self._government_legitimacy)
-
-        # estimate arrest probability
-        c = 0
-        a = 1
-        for neighbour_coord in self._coord_neighbours[self._turtle_coords[turtle]]:
-            for neighbour in self._coord_turtles[neighbour_coord]:
-                if isinstance(neighbour, Cop):
-                    c += 1
-                if isinstance(neighbour, Agent) and neighbour.active:
-                    a += 1
+        mode : string
+            the mode to open the csv with, "w" for a new report or "a" to continue one
+        """
+        # a large buffer means long runs only write to disk every few thousand ticks
+        self._report_file = open(self._report_path, mode, newline='', buffering=1 << 16)
+        self._report_writer = csv.writer(self._report_file, lineterminator="\n")
 
-        estimated_arrest_probability = 1 - math.exp(-K * math.floor(c / a))
+    def __close_report(self):
+        """
+        Closes the temporary report csv, writing out any buffered rows
+        """
+        if self._report_file is not None:
+            self._report_file.close()
+            self._report_file = None
+            self._report_writer = None
 
-        return (grievance - turtle.risk_aversion * estimated_arrest_probability) > THRESHOLD
-            
-    def __enforce(self, turtle: Cop, coord):
+    def __discard_report(self):
+        """
+        Closes and removes the temporary report csv
         """
-        Helper function to help simulate a tick in the go function, attempts to perform an arrest
+        self.__close_report()
+        if self._report_path is not None:
+            try:
+                os.remove(self._report_path)
+            except FileNotFoundError:
+                pass
+            self._report_path = None
+
+    def __record_report(self, quiet, jailed, active):
+        """
+        Records the state of the system at the current tick
 
         Parameters
         ----------
-        turtle : Cop
-            the cop performing the arrest
-        coord : _type_
-            the coordinate of the cop
+        quiet : int
+            the number of quiet agents
+        jailed : int
+            the number of jailed agents
+        active : int
+            the number of active agents
         """
-        suspects = []
-        
-        # gather suspects of active agents from neighbours near turtle
-        for neighbour_coord in self._coord_neighbours[coord]:
-            for neighbour in self._coord_turtles[neighbour_coord]:
-                if isinstance(neighbour, Agent) and neighbour.active:
-                    suspects.append((neighbour, neighbour_coord))
-
-        # choose suspect
-        if suspects:
-            suspect, suspect_coord = random.choice(suspects)
-
-            # move cop to suspect
-            if coord != self._turtle_coords[turtle]:
-                print("Failed")
-                print(coord)
-                print(self._turtle_coords[turtle])
-            self.__move_turtle(turtle, coord, suspect_coord)
-
-            # arrest suspect
-            suspect.active = False
-            suspect.jail_term = random.randrange(self._max_jail_term)
+        # the csv is closed by generate_report, continue it when the simulation carries on
+        if self._report_file is None:
+            self.__open_report("a")
+        self._report_writer.writerow([self._tick, quiet, jailed, active])
+
+        # double the history when it is full so recording stays cheap over long runs
+        if self._history_length == len(self._history):
+            self._history = np.concatenate((self._history, np.zeros_like(self._history)))
+
+        self._history[self._history_length] = (quiet, jailed, active)
+        self._history_length += 1
 
     def update_government_legitimacy(self, government_legitimacy):
         """
@@ -525,6 +944,7 @@ class RebellionManager:
         """
         self.__validate_value("government_legitimacy", government_legitimacy, float, 0, 1)
         self._government_legitimacy = government_legitimacy
+        self._one_minus_legitimacy = 1 - government_legitimacy
 
     def update_max_jail_term(self, max_jail_term):
         """
@@ -555,38 +975,28 @@ class RebellionManager:
         """
         Generates a report of the combined statistics from the simulation thus far
         """
-        if self._report == []:
+        if self._report_path is None:
             print("Nothing to Report")
             return
 
-        # generating statstics
-        quiet = []
-        jailed = []
-        active = []
-
-        for x in self._report:
-            quiet.append(x["quiet"])
-            jailed.append(x["jailed"])
-            active.append(x["active"])
+        # generating statstics, the counts are converted back to python ints so the statistics module
+        # reports them exactly as it did when they were kept in lists
+        quiet, jailed, active = self._history[:self._history_length].T.tolist()
 
         print("Generating statistics for the run")
         print(f"quiet:\n mean = {st.mean(quiet)}" + 
-                            f", std = {st.stdev(quiet)}, max = {max(quiet)}, min = {min(quiet)}")
+                    f", std = {st.stdev(quiet)}, max = {max(quiet)}, min = {min(quiet)}")
         print(f"jailed:\n mean = {st.mean(jailed)}" + 
-                            f", std = {st.stdev(jailed)}, max = {max(jailed)}, min = {min(jailed)}")
+                    f", std = {st.stdev(jailed)}, max = {max(jailed)}, min = {min(jailed)}")
         print(f"active:\n mean = {st.mean(active)}" + 
-                        f", std = {st.stdev(active)}, max = {max(active)}, min = {min(active)}\n")
+                    f", std = {st.stdev(active)}, max = {max(active)}, min = {min(active)}\n")
 
         print("Saving to csv...")
 
-        # Open a file in write mode.
-        with open('test.csv', 'w') as f:
-            f.write(','.join(self._report[0].keys()))
-            f.write('\n') # Add a new line
-            for row in self._report:
-                # Write the values in a row.
-                f.write(','.join(str(x) for x in row.values()))
-                f.write('\n') # Add a new line
+        # the rows have already been written as the simulation ran, the whole report replaces 
+        # test.csv at once so it always holds a complete report
+        self.__close_report()
+        shutil.copyfile(self._report_path, 'test.csv')
 
         print("Done !!")
 
@@ -608,11 +1018,8 @@ def main():
     Below provides a sample of how the RebellionManager may be used to simulate rebellion within a
     population
     """
-    # intialise seed for random number generator
-    random.seed(12)
-
-    # initialise manager and size of the world 
-    manager = RebellionManager(max_pxcor=39, max_pycor=39)
+    # initialise manager, size of the world and seed for the random number generators
+    manager = RebellionManager(max_pxcor=39, max_pycor=39, seed=12)
 
     # intialise world parameters
     manager.setup(initial_cop_density=4.0, initial_agent_density=70, vision=7.0, 
@@ -621,7 +1028,7 @@ def main():
     # start simulation
     NUM_TICKS_TO_SIMULATE = 100
     for tick in range(NUM_TICKS_TO_SIMULATE):
-        manager.go(mute=True, aggregate_greivance=True)
+        manager.go(aggregate_greivance=True)
 
     # generate report from simulation
     manager.generate_report()